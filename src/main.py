@@ -1,41 +1,193 @@
-from collections import OrderedDict
-
+import contextlib
+import csv
+import fcntl
+import functools
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from types import MappingProxyType
+
+import orjson
 import pandas as pd
-from fastapi import FastAPI, UploadFile, File, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Form, Header, HTTPException, Response, status
+from fastapi.responses import ORJSONResponse
 
 from src.config import settings
 from src.pdf_service import PdfService
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 DATABASE_FILE = settings.DATABASE_FILE
 PDF_SERVICE_KEY = settings.PDF_SERVICE_KEY
-FILE_NAME_TO_PATH = settings.FILE_NAME_TO_PATH
+# Keys are lowercased once here so lookups can match case-insensitively
+FILE_NAME_TO_PATH = MappingProxyType(
+    {name.lower(): path for name, path in settings.FILE_NAME_TO_PATH.items()}
+)
 
 pdf_service = PdfService(key=PDF_SERVICE_KEY)
 
+# The root response never changes, so it is encoded once and reused
+_ROOT_BODY = orjson.dumps({"message": "Welcome to the Data Discrepancy Checker API"})
+_ROOT_ETAG = f'"{hashlib.sha1(_ROOT_BODY).hexdigest()}"'
+_ROOT_RESPONSE = Response(
+    content=_ROOT_BODY, media_type="application/json", headers={"ETag": _ROOT_ETAG}
+)
+_ROOT_NOT_MODIFIED = Response(
+    status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": _ROOT_ETAG}
+)
 
-def load_database() -> pd.DataFrame:
+# Parsed copy of DATABASE_FILE, reused until the file's mtime changes
+_DB_CACHE: dict = {"df": None, "mtime": 0, "by_company": {}}
+_DB_WRITE_LOCK = threading.Lock()
+
+
+def _read_database() -> pd.DataFrame:
     """
-    Load the database from a CSV file.
+    Parse the database CSV from a memory-mapped file into Arrow-backed columns.
+
+    The C parser is used with dtype_backend="pyarrow" rather than the pyarrow
+    engine, which infers dates and timestamps from string values written
+    through /update-db.
+
+    Returns:
+        pd.DataFrame: The parsed DataFrame.
+    """
+    return pd.read_csv(DATABASE_FILE, memory_map=True, dtype_backend="pyarrow")
+
+
+def _cache_database(database_df: pd.DataFrame, mtime: float) -> None:
+    """
+    Store a DataFrame in the database cache along with its per-company index.
+
+    Args:
+        database_df (pd.DataFrame): The DataFrame to cache.
+        mtime (float): The modification time of the file it was read from.
+
+    Returns:
+        None
+    """
+    # Missing values (NaN/NA) are stored as None to match missing PDF fields
+    # Rows are zipped straight from itertuples to avoid building a Series per row
+    columns = list(database_df.columns)
+    rows = (
+        {
+            field: None if pd.isna(value) else value
+            for field, value in zip(columns, values)
+        }
+        for values in database_df.itertuples(index=False, name=None)
+    )
+    # If a company appears more than once, its first row is used
+    by_company = {}
+    for row in rows:
+        by_company.setdefault(row["Company Name"], row)
+    _DB_CACHE["by_company"] = by_company
+    # Handlers run in a threadpool, so mtime is set last: readers that see the
+    # new mtime are guaranteed to see the matching index
+    _DB_CACHE["df"] = database_df
+    _DB_CACHE["mtime"] = mtime
+
+
+def _refresh_database_cache() -> pd.DataFrame:
+    """
+    Re-read the database file into the cache if it changed since the last read.
 
     Raises:
         RuntimeError: If the database file cannot be loaded.
 
     Returns:
-        pd.DataFrame: The loaded DataFrame.
+        pd.DataFrame: The up-to-date cached DataFrame. Callers must not mutate it.
     """
     try:
-        return pd.read_csv(DATABASE_FILE)
+        mtime = os.stat(DATABASE_FILE).st_mtime
+        # Read the reference once: a concurrent write may reset the cache to None
+        database_df = _DB_CACHE["df"]
+        if database_df is None or _DB_CACHE["mtime"] != mtime:
+            database_df = _read_database()
+            _cache_database(database_df, mtime)
+        return database_df
     except Exception as e:
         raise RuntimeError(f"Error loading database: {e}") from e
 
 
+def load_database() -> pd.DataFrame:
+    """
+    Load the database from a CSV file.
+
+    The parsed DataFrame is cached and only re-read when the file's
+    modification time changes.
+
+    Raises:
+        RuntimeError: If the database file cannot be loaded.
+
+    Returns:
+        pd.DataFrame: A copy of the loaded DataFrame.
+    """
+    return _refresh_database_cache().copy()
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_extract(
+    file_path: str, mtime: float
+) -> dict[str, str | int | float | None]:
+    """
+    Extract data from a PDF, memoised on its path and modification time.
+
+    Args:
+        file_path (str): The path of the PDF to extract.
+        mtime (float): The PDF's modification time, so edits are re-extracted.
+
+    Returns:
+        dict: The extracted data. Callers must not mutate it.
+    """
+    return pdf_service.extract(file_path=file_path)
+
+
+def extract_pdf_data(file_path: str) -> dict[str, str | int | float | None]:
+    """
+    Extract data from a PDF, reusing earlier results for unchanged files.
+
+    Files that can't be stat'ed locally are passed to the service uncached.
+
+    Args:
+        file_path (str): The path of the PDF to extract.
+
+    Raises:
+        FileNotFoundError: If the file is missing or cannot be extracted.
+
+    Returns:
+        dict: The extracted data. Callers must not mutate it.
+    """
+    try:
+        mtime = os.path.getmtime(file_path)
+    except OSError:
+        # The service doesn't need the file on this disk, so extract uncached
+        return pdf_service.extract(file_path=file_path)
+    return _cached_extract(file_path, mtime)
+
+
+def load_company_row(company_name: str) -> dict[str, str | int | float | None] | None:
+    """
+    Load a single company's row from the database.
+
+    Args:
+        company_name (str): The name of the company to look up.
+
+    Raises:
+        RuntimeError: If the database file cannot be loaded.
+
+    Returns:
+        dict | None: The company's data, or None if it is not in the database.
+    """
+    _refresh_database_cache()
+    return _DB_CACHE["by_company"].get(company_name)
+
+
 def compare_data(
     db_data: dict[str, str | int | float | None],
     pdf_data: dict[str, str | int | float | None],
-) -> OrderedDict[str, dict[str, str | int | float | None]]:
+) -> dict[str, dict[str, str | int | float | None]]:
     """
     Compare data between the database and the extracted PDF data.
 
@@ -44,24 +196,24 @@ def compare_data(
         pdf_data: Data extracted from the PDF.
 
     Returns:
-        OrderedDict: A comparison summary of the two data sources, maintaining
+        dict: A comparison summary of the two data sources, maintaining
         the order of fields as they appear in the PDF.
     """
-    summary = OrderedDict()
+    db_get = db_data.get
 
     # Add fields from pdf_data first to maintain their order
-    for field, pdf_value in pdf_data.items():
-        db_value = db_data.get(field)
-        match = db_value == pdf_value or (db_value is None and pdf_value is None)
-        summary[field] = {
-            "database": db_value,
+    summary = {
+        field: {
+            "database": (db_value := db_get(field)),
             "pdf": pdf_value,
-            "match": match,
+            "match": db_value == pdf_value,
         }
+        for field, pdf_value in pdf_data.items()
+    }
 
     # Add remaining fields from db_data that are not in pdf_data
     for field, db_value in db_data.items():
-        if field not in summary:
+        if field not in pdf_data:
             summary[field] = {
                 "database": db_value,
                 "pdf": None,
@@ -71,77 +223,122 @@ def compare_data(
     return summary
 
 
-def save_data_to_db(database_df: pd.DataFrame) -> None:
+@contextlib.contextmanager
+def _database_write_lock():
+    """
+    Hold an exclusive lock on the database across threads and worker processes.
+
+    The inter-process lock is an flock on a sidecar file next to the database,
+    since the database itself is replaced rather than written in place.
+
+    Yields:
+        None
     """
-    Save the DataFrame to a CSV file.
+    with _DB_WRITE_LOCK, open(f"{DATABASE_FILE}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def save_data_to_db(rows: list[dict[str, str]], fieldnames: list[str]) -> None:
+    """
+    Save the rows to the CSV file and invalidate the cached database.
 
     Args:
-        database_df (pd.DataFrame): The DataFrame to be saved.
+        rows (list[dict[str, str]]): The rows to be saved.
+        fieldnames (list[str]): The CSV columns, in order.
 
     Returns:
         None
     """
-    database_df.to_csv(DATABASE_FILE, index=False)
+    # Write to a temp file and swap it in, so readers never see a partial file
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(DATABASE_FILE)), suffix=".csv"
+    )
+    try:
+        with os.fdopen(fd, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+        shutil.copymode(DATABASE_FILE, temp_path)
+        os.replace(temp_path, DATABASE_FILE)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    _DB_CACHE["df"] = None
 
 
-def update(
-    database_df: pd.DataFrame, company_name: str, field: str, new_value: str
-) -> None:
+def update(company_name: str, field: str, new_value: str) -> None:
     """
-    Update a specific field for a company in the DataFrame.
+    Update a specific field for a company in the database file.
 
     Args:
-        database_df (pd.DataFrame): The DataFrame containing the company data.
         company_name (str): The name of the company to update.
         field (str): The field to be updated.
         new_value (str): The new value for the field.
 
     Raises:
-        HTTPException: If the company name is not found in the DataFrame.
+        HTTPException: If the company name is not found in the database.
 
     Returns:
         None
     """
-    if not database_df["Company Name"].isin([company_name]).any():
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Invalid '{company_name}' not found",
-        )
+    # Handlers run concurrently, possibly in several worker processes, so the
+    # read-modify-write must not interleave
+    with _database_write_lock():
+        with open(DATABASE_FILE, newline="") as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+            fieldnames = list(reader.fieldnames or [])
+
+        matches = [row for row in rows if row["Company Name"] == company_name]
+        if not matches:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Invalid '{company_name}' not found",
+            )
 
-    database_df.loc[database_df["Company Name"] == company_name, field] = new_value
-    save_data_to_db(database_df)
+        # Unknown fields are added as a new column, left empty for other companies
+        if field not in fieldnames:
+            fieldnames.append(field)
+
+        for row in matches:
+            row[field] = new_value
+        save_data_to_db(rows, fieldnames)
 
 
 @app.post("/upload-pdf")
-async def upload_pdf(file: UploadFile = File(...)) -> JSONResponse:
+def upload_pdf(filename: str = Form(...)) -> ORJSONResponse:
     """
-    Upload a PDF and compare its data with the database.
+    Compare a known PDF's data with the database.
+
+    Only the filename is needed to resolve the PDF asset, so the file body
+    is not uploaded.
 
     Args:
-        file: The uploaded PDF file.
+        filename: The name of the PDF file.
 
     Raises:
         HTTPException: If any errors occur during processing.
 
     Returns:
-        JSONResponse: The result of the data comparison.
+        ORJSONResponse: The result of the data comparison.
     """
     try:
-        original_filename = file.filename.lower()
-        if original_filename not in FILE_NAME_TO_PATH:
+        mapped_file_path = FILE_NAME_TO_PATH.get(filename.lower())
+        if mapped_file_path is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid filename provided",
             )
 
-        mapped_file_path = FILE_NAME_TO_PATH[original_filename]
-
         try:
-            extracted_data = pdf_service.extract(file_path=mapped_file_path)
+            extracted_data = extract_pdf_data(mapped_file_path)
         except FileNotFoundError as e:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-        database = load_database()
         company_name = extracted_data.get("Company Name")
 
         if not company_name:
@@ -150,17 +347,17 @@ async def upload_pdf(file: UploadFile = File(...)) -> JSONResponse:
                 detail="Company name not found in the PDF",
             )
 
-        db_data = database[database["Company Name"] == company_name]
-        if db_data.empty:
+        db_data = load_company_row(company_name)
+        if db_data is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"No data found for company: {company_name}",
             )
 
-        db_data = db_data.iloc[0].to_dict()
-
         summary = compare_data(db_data, extracted_data)
-        return JSONResponse(content={"company_name": company_name, "summary": summary})
+        return ORJSONResponse(
+            content={"company_name": company_name, "summary": summary}
+        )
 
     except HTTPException:  # Pass through HTTP exceptions correctly
         raise
@@ -172,7 +369,7 @@ async def upload_pdf(file: UploadFile = File(...)) -> JSONResponse:
 
 
 @app.post("/update-db")
-async def update_db(company_name: str, field: str, new_value: str) -> JSONResponse:
+def update_db(company_name: str, field: str, new_value: str) -> ORJSONResponse:
     """
     Update a specific field for a company in the database.
 
@@ -185,12 +382,11 @@ async def update_db(company_name: str, field: str, new_value: str) -> JSONRespon
         HTTPException: If an error occurs while updating the database.
 
     Returns:
-        JSONResponse: A JSON response indicating the success of the update.
+        ORJSONResponse: A JSON response indicating the success of the update.
     """
     try:
-        database_df = load_database()
-        update(database_df, company_name, field, new_value)
-        return JSONResponse(content={"message": "DB updated successfully"})
+        update(company_name, field, new_value)
+        return ORJSONResponse(content={"message": "DB updated successfully"})
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -201,11 +397,20 @@ async def update_db(company_name: str, field: str, new_value: str) -> JSONRespon
 
 
 @app.get("/")
-async def read_root() -> dict[str, str]:
+async def read_root(if_none_match: str | None = Header(default=None)) -> Response:
     """
     Read the root endpoint.
 
+    Args:
+        if_none_match (str | None): ETags the client already has cached.
+
     Returns:
-        dict[str, str]: A welcoming message.
+        Response: A welcoming message, or 304 Not Modified if the client's
+        cached copy is current.
     """
-    return {"message": "Welcome to the Data Discrepancy Checker API"}
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or _ROOT_ETAG in (tag.strip() for tag in if_none_match.split(","))
+    ):
+        return _ROOT_NOT_MODIFIED
+    return _ROOT_RESPONSE
@@ -1,18 +1,41 @@
+import multiprocessing
+import shutil
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 from fastapi.testclient import TestClient
 
-from src.main import app, compare_data, load_database
+import src.main
+from src.main import (
+    app,
+    compare_data,
+    extract_pdf_data,
+    load_company_row,
+    load_database,
+)
 
 client = TestClient(app)
 
 
+@pytest.fixture
+def temp_database(tmp_path, monkeypatch):
+    """
+    Point the API at a temporary copy of the database file.
+    """
+    database_file = tmp_path / "database.csv"
+    shutil.copy(src.main.DATABASE_FILE, database_file)
+    monkeypatch.setattr(src.main, "DATABASE_FILE", str(database_file))
+    return database_file
+
+
 class TestAPI:
     """
     API Tests for the PDF data discrepancy checker
     """
 
+    API_PATHS = ["/", "/upload-pdf", "/update-db"]
+
     def test_root_endpoint(self):
         """
         Test the root endpoint is working and returns the correct message.
@@ -23,45 +46,83 @@ class TestAPI:
             "message": "Welcome to the Data Discrepancy Checker API"
         }
 
+    def test_root_endpoint_not_modified(self):
+        """
+        Test the root endpoint returns 304 when the client's ETag is current.
+        """
+        etag = client.get("/").headers["etag"]
+        response = client.get("/", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+
+    def test_routes_registered_once(self):
+        """
+        Test that each endpoint is registered exactly once.
+        """
+        paths = [route.path for route in app.routes if route.path in self.API_PATHS]
+        assert sorted(paths) == sorted(self.API_PATHS)
+
     def test_upload_pdf_valid(self):
         """
         Test uploading a valid PDF file and check for correct processing.
         """
-        with open("assets/retailco.pdf", "rb") as pdf_file:
-            response = client.post(
-                "/upload-pdf",
-                files={"file": ("retailco.pdf", pdf_file, "application/pdf")},
-            )
-            assert response.status_code == 200
-            result = response.json()
-            assert result["company_name"] == "RetailCo"
-            assert "summary" in result
+        response = client.post("/upload-pdf", data={"filename": "retailco.pdf"})
+        assert response.status_code == 200
+        result = response.json()
+        assert result["company_name"] == "RetailCo"
+        assert "summary" in result
 
     def test_upload_pdf_invalid_filename(self):
         """
         Test uploading a PDF file with an invalid filename.
         """
-        with open("assets/retailco.pdf", "rb") as pdf_file:
-            response = client.post(
-                "/upload-pdf",
-                files={"file": ("invalid.pdf", pdf_file, "application/pdf")},
-            )
-            assert response.status_code == 400
-            assert response.json() == {"detail": "Invalid filename provided"}
+        response = client.post("/upload-pdf", data={"filename": "invalid.pdf"})
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Invalid filename provided"}
 
     def test_upload_pdf_file_not_found(self):
         """
         Test uploading a PDF file that the PdfService cannot find.
         """
-        with open("assets/techcorp.pdf", "rb") as pdf_file:
-            response = client.post(
-                "/upload-pdf",
-                files={"file": ("techcorp.pdf", pdf_file, "application/pdf")},
-            )
-            assert response.status_code == 400
-            assert response.json() == {
-                "detail": "Cannot extract data. Invalid file provided."
-            }
+        response = client.post("/upload-pdf", data={"filename": "techcorp.pdf"})
+        assert response.status_code == 400
+        assert response.json() == {
+            "detail": "Cannot extract data. Invalid file provided."
+        }
+
+    def test_load_database_invalidated_during_load(self, temp_database, monkeypatch):
+        """
+        Test that a write invalidating the cache mid-load doesn't break the load.
+        """
+        cache_database = src.main._cache_database
+
+        def cache_then_invalidate(database_df, mtime):
+            cache_database(database_df, mtime)
+            src.main._DB_CACHE["df"] = None
+
+        monkeypatch.setattr(src.main, "_cache_database", cache_then_invalidate)
+        src.main._DB_CACHE["df"] = None
+        assert not load_database().empty
+
+    def test_extract_pdf_data_is_cached(self):
+        """
+        Test that repeated extraction of an unchanged PDF reuses the first result.
+        """
+        assert extract_pdf_data("assets/retailco.pdf") is extract_pdf_data(
+            "assets/retailco.pdf"
+        )
+
+    def test_extract_pdf_data_missing_local_file(self, monkeypatch):
+        """
+        Test that a PDF missing from local disk is still passed to the service.
+        """
+
+        def getmtime(path):
+            raise FileNotFoundError(f"No such file or directory: '{path}'")
+
+        monkeypatch.setattr(src.main.os.path, "getmtime", getmtime)
+        data = extract_pdf_data("assets/retailco.pdf")
+        assert data["Company Name"] == "RetailCo"
 
     def test_load_database(self):
         """
@@ -71,6 +132,129 @@ class TestAPI:
         assert not database.empty
         assert "Company Name" in database.columns
 
+    def test_load_database_returns_cached_copy(self):
+        """
+        Test that the cached database is not affected by changes to a returned copy.
+        """
+        database = load_database()
+        database.loc[0, "Company Name"] = "Changed"
+        assert load_database().loc[0, "Company Name"] != "Changed"
+
+    def test_load_company_row(self):
+        """
+        Test that a single company's row is looked up by name.
+        """
+        row = load_company_row("RetailCo")
+        assert row["Company Name"] == "RetailCo"
+        assert row["Location"] == "Chicago"
+        assert load_company_row("Unknown") is None
+
+    def test_load_company_row_duplicate_company(self, temp_database):
+        """
+        Test that the first row is used when a company appears more than once.
+        """
+        with open(temp_database, "a") as f:
+            f.write("RetailCo,Retail,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,Elsewhere\n")
+        assert load_company_row("RetailCo")["Location"] == "Chicago"
+
+    def test_update_db(self, temp_database):
+        """
+        Test that updating a field is persisted and visible on the next load.
+        """
+        load_database()
+        response = client.post(
+            "/update-db",
+            params={
+                "company_name": "RetailCo",
+                "field": "Location",
+                "new_value": "Chicago, IL",
+            },
+        )
+        assert response.status_code == 200
+        assert response.json() == {"message": "DB updated successfully"}
+
+        database = load_database()
+        row = database[database["Company Name"] == "RetailCo"].iloc[0]
+        assert row["Location"] == "Chicago, IL"
+        assert row["Debt (in millions)"] == 100
+
+    def test_update_db_concurrent_updates(self, temp_database):
+        """
+        Test that concurrent updates and reads neither lose writes nor fail.
+        """
+        fields = [f"Field {i}" for i in range(64)]
+
+        def update_field(field):
+            src.main.update("RetailCo", field, "value")
+            return load_company_row("RetailCo")
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            rows = list(executor.map(update_field, fields))
+
+        assert all(row is not None for row in rows)
+        row = load_company_row("RetailCo")
+        assert all(row[field] == "value" for field in fields)
+
+    def test_update_db_concurrent_processes(self, temp_database):
+        """
+        Test that updates from separate worker processes are not lost.
+        """
+
+        def update_fields(tag):
+            for i in range(40):
+                src.main.update("RetailCo", f"F{tag}{i}", "value")
+
+        context = multiprocessing.get_context("fork")
+        processes = [context.Process(target=update_fields, args=(t,)) for t in "ab"]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        assert all(process.exitcode == 0 for process in processes)
+        row = load_company_row("RetailCo")
+        assert all(row[f"F{tag}{i}"] == "value" for tag in "ab" for i in range(40))
+
+    def test_update_db_date_like_value(self, temp_database):
+        """
+        Test that date-like values written via /update-db are compared as strings.
+        """
+        response = client.post(
+            "/update-db",
+            params={
+                "company_name": "RetailCo",
+                "field": "CEO",
+                "new_value": "2024-01-01 10:00",
+            },
+        )
+        assert response.status_code == 200
+
+        response = client.post("/upload-pdf", data={"filename": "retailco.pdf"})
+        assert response.status_code == 200
+        assert response.json()["summary"]["CEO"] == {
+            "database": "2024-01-01 10:00",
+            "pdf": "Bob Johnson",
+            "match": False,
+        }
+
+        src.main.update("RetailCo", "Founded", "2024-01-01")
+        assert load_company_row("RetailCo")["Founded"] == "2024-01-01"
+
+    def test_update_db_company_not_found(self, temp_database):
+        """
+        Test updating a company that does not exist in the database.
+        """
+        response = client.post(
+            "/update-db",
+            params={
+                "company_name": "Unknown",
+                "field": "Location",
+                "new_value": "Paris",
+            },
+        )
+        assert response.status_code == 404
+        assert response.json() == {"detail": "Invalid 'Unknown' not found"}
+
     def test_compare_data_with_missing_fields(self):
         """
         Test the data comparison logic for cases with missing fields in PDF and database.
@@ -118,7 +302,9 @@ class TestAPI:
             ]
         )
 
-        assert compare_data(db_data, pdf_data) == expected_summary
+        summary = compare_data(db_data, pdf_data)
+        assert summary == expected_summary
+        assert list(summary.items()) == list(expected_summary.items())
 
     def test_compare_data_with_additional_fields(self):
         """
@@ -158,7 +344,9 @@ class TestAPI:
             ]
         )
 
-        assert compare_data(db_data, pdf_data) == expected_summary
+        summary = compare_data(db_data, pdf_data)
+        assert summary == expected_summary
+        assert list(summary.items()) == list(expected_summary.items())
 
 
 if __name__ == "__main__":